@@ -0,0 +1,179 @@
+"""
+gen_output.py
+
+Helpers shared by the gen_panorama_*.py generators:
+- Host IP strings for the address objects
+- Counted, batched output for the size-targeted generators
+- --compress support (gzip from the standard library, zstd via zstandard >= 0.15)
+"""
+
+import contextlib
+import gzip
+import itertools
+
+
+# Entries are rendered and written this many at a time.
+ENTRY_BATCH = 4096
+
+# Decimal strings for every possible octet value
+OCTETS = [str(i) for i in range(256)]
+
+# Upper bound on the length of an address string, for sizing batches
+LONGEST_IP = "ffff:ffff:ffff:ffff:ffff:ffff:ffff:ffff"
+
+# Output file suffix for each --compress choice
+COMPRESS_SUFFIX = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+
+
+class CountingWriter:
+    """
+    Wrap a binary file, batching small writes into chunks of about batch bytes and
+    keeping a running count of bytes written.
+    """
+
+    def __init__(self, f, batch: int = 1 << 20) -> None:
+        self.f = f
+        self.n = 0
+        self.batch = batch
+        self.chunks = []
+        self.pending = 0
+
+    def write(self, b: bytes) -> None:
+        self.n += len(b)
+        self.chunks.append(b)
+        self.pending += len(b)
+        if self.pending >= self.batch:
+            self._write_pending()
+
+    def _write_pending(self) -> None:
+        self.f.write(b"".join(self.chunks))
+        self.chunks.clear()
+        self.pending = 0
+
+    def write_block(self, b: bytes) -> None:
+        """Write an already-batched block straight to the file, after anything pending."""
+        if self.chunks:
+            self._write_pending()
+        self.n += len(b)
+        self.f.write(b)
+
+    def flush(self) -> None:
+        if self.chunks:
+            self._write_pending()
+        self.f.flush()
+
+
+def compressor(name: str):
+    """
+    Return a function that wraps a binary file in a compressing writer for --compress,
+    or None for "none". zstandard is only needed (and imported) for "zstd".
+    """
+    if name == "gzip":
+        return lambda out: gzip.GzipFile(fileobj=out, mode="wb", compresslevel=1)
+    if name == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise SystemExit("--compress zstd needs the zstandard package (pip install 'zstandard>=0.15')")
+        return lambda out: zstandard.ZstdCompressor(level=3).stream_writer(out, closefd=False)
+    return None
+
+
+@contextlib.contextmanager
+def open_output(path: str, compress: str = "none"):
+    """
+    Open path for writing and yield it wrapped in a CountingWriter, so generators can
+    track the bytes written themselves instead of stat()ing the file every entry.
+    With compress, the output goes through that --compress choice; the count is of
+    uncompressed bytes.
+
+    Pending chunks are flushed (and a compressed stream finished) on the way out even
+    if generation fails, so a partial run keeps everything written before the error.
+    """
+    # Before open(), so a missing zstandard doesn't leave an empty file behind
+    open_compressed = compressor(compress)
+    with open(path, "wb", buffering=1 << 20) as raw:
+        stream = raw if open_compressed is None else open_compressed(raw)
+        f = CountingWriter(stream)
+        try:
+            yield f
+        finally:
+            try:
+                f.flush()
+            finally:
+                if stream is not raw:
+                    # Finish the compressed stream; raw itself is closed by the with
+                    stream.close()
+
+
+def write_rules_until(f: CountingWriter, rule_tmpl: bytes, target: int, first: int = 1) -> int:
+    """
+    Write rules numbered first, first + 1, ... from rule_tmpl (one %d for the number)
+    until f.n reaches target, returning how many were written.
+
+    Stops at exactly the same rule as writing one rule per loop iteration would, but
+    renders ENTRY_BATCH rules at a time with map() so the per-rule work runs in C.
+    """
+    n = first
+    while f.n < target:
+        remaining = target - f.n
+        # Size the batch by its longest (highest-numbered) rule so it can never run
+        # past the point where a rule-at-a-time loop would have stopped.
+        upper = remaining // len(rule_tmpl % n)
+        count = min(ENTRY_BATCH, max(1, remaining // len(rule_tmpl % (n + upper))))
+        f.write_block(b"".join(map(rule_tmpl.__mod__, range(n, n + count))))
+        n += count
+    return n - first
+
+
+def host_ips(net, start: int = 0):
+    """
+    Yield the usable host addresses of net as strings, like map(str, net.hosts()),
+    but built from octet strings instead of an ip_address object per host.
+    The first start hosts are skipped.
+    """
+    if net.version != 4:
+        yield from itertools.islice(map(str, net.hosts()), start, None)
+        return
+
+    first = int(net.network_address)
+    last = int(net.broadcast_address)
+    if net.num_addresses > 2:
+        # Skip network and broadcast addresses (/31 and /32 have neither)
+        first += 1
+        last -= 1
+    n = first + start
+    while n <= last:
+        # One /24 at a time: the first three octets are shared, the last comes from a table
+        end = min(last, n | 255)
+        prefix = f"{n >> 24}.{(n >> 16) & 255}.{(n >> 8) & 255}."
+        yield from map(prefix.__add__, OCTETS[n & 255:(end & 255) + 1])
+        n = end + 1
+
+
+def write_addresses_until(f: CountingWriter, prefix: str, ip_iter, target: int,
+                          out_of_ips: str, limit: int = 0) -> int:
+    """
+    Write address objects named <prefix>-<ip> from ip_iter until f.n reaches target
+    (or limit objects are written, if non-zero), returning how many were written.
+    Raises RuntimeError(out_of_ips) if ip_iter runs dry first.
+
+    Batched like write_rules_until(), sizing each batch by the longest possible entry
+    so it stops on exactly the object a one-at-a-time loop would.
+    """
+    longest = len(f'      <entry name="{prefix}-{LONGEST_IP}"><ip-netmask>{LONGEST_IP}</ip-netmask></entry>\n'.encode())
+    count = 0
+    while f.n < target and not (limit and count >= limit):
+        batch = min(ENTRY_BATCH, max(1, (target - f.n) // longest))
+        if limit:
+            batch = min(batch, limit - count)
+        ips = list(itertools.islice(ip_iter, batch))
+
+        f.write_block("".join([
+            f'      <entry name="{prefix}-{ip}"><ip-netmask>{ip}</ip-netmask></entry>\n' for ip in ips
+        ]).encode())
+        count += len(ips)
+        if len(ips) < batch:
+            # Everything up to the last IP is kept, like the one-at-a-time loop did
+            raise RuntimeError(out_of_ips)
+    return count
@@ -19,15 +19,21 @@ import ipaddress
 import os
 import time
 
+from gen_output import COMPRESS_SUFFIX, host_ips, open_output, write_addresses_until, write_rules_until
 
-def write_line(f, s: str) -> None:
-    f.write(s)
-    if not s.endswith("\n"):
-        f.write("\n")
 
-
-def current_size(path: str) -> int:
-    return os.path.getsize(path) if os.path.exists(path) else 0
+# Any/any allow rule, pre-encoded; only the entry name varies.
+RULE_TMPL = (
+    b'                <entry name="%s">\n'
+    b"                  <from><member>any</member></from>\n"
+    b"                  <to><member>any</member></to>\n"
+    b"                  <source><member>any</member></source>\n"
+    b"                  <destination><member>any</member></destination>\n"
+    b"                  <application><member>any</member></application>\n"
+    b"                  <service><member>any</member></service>\n"
+    b"                  <action>allow</action>\n"
+    b"                </entry>\n"
+)
 
 
 def main() -> None:
@@ -39,101 +45,77 @@ def main() -> None:
     parser.add_argument("--dg", default="DG_TEST", help="Device Group name")
     parser.add_argument("--addr-prefix", default="test-addr_obj", help="Address object name prefix")
     parser.add_argument("--rule-prefix", default="test-rule", help="Security rule name prefix")
-    parser.add_argument("--flush-every", type=int, default=2000, help="Flush interval (entries)")
+    parser.add_argument("--flush-every", type=int, default=2000, help="Ignored; kept for compatibility")
     parser.add_argument("--max-addrs", type=int, default=0,
                         help="Optional cap on address objects (0 = no cap)")
     parser.add_argument("--addr-fill-percent", type=float, default=70.0,
                         help="Percent of target size to dedicate to address objects before rules (default 70)")
+    parser.add_argument("--compress", choices=sorted(COMPRESS_SUFFIX), default="none",
+                        help="Compress the output as it is written (.gz / .zst is appended to --out); "
+                             "--size-mb still counts uncompressed bytes")
     args = parser.parse_args()
 
     target_bytes = int(args.size_mb * 1024 * 1024)
     addr_target_bytes = int(target_bytes * (args.addr_fill_percent / 100.0))
 
-    out_path = args.out
-    if os.path.exists(out_path):
-        os.remove(out_path)
+    out_path = args.out + COMPRESS_SUFFIX[args.compress]
 
     network = ipaddress.ip_network(args.base_network, strict=False)
-    ip_iter = network.hosts()
+    ip_iter = host_ips(network)
 
-    addr_count = 0
-    rule_count = 0
     t0 = time.time()
 
-    with open(out_path, "w", encoding="utf-8", newline="\n") as f:
+    with open_output(out_path, args.compress) as f:
         # Header
-        write_line(f, '<?xml version="1.0" encoding="utf-8"?>')
-        write_line(f, "<config>")
-        write_line(f, "  <shared>")
-        write_line(f, "    <address>")
+        f.write(b'<?xml version="1.0" encoding="utf-8"?>\n'
+                b"<config>\n"
+                b"  <shared>\n"
+                b"    <address>\n")
 
         # Address objects until addr_target_bytes (or max-addrs)
-        while current_size(out_path) < addr_target_bytes:
-            if args.max_addrs and addr_count >= args.max_addrs:
-                break
-
-            try:
-                ip = str(next(ip_iter))
-            except StopIteration:
-                raise RuntimeError(
-                    f"Ran out of IPs in base network {args.base_network}. "
-                    f"Use a larger network like 10.0.0.0/8."
-                )
-
-            name = f"{args.addr_prefix}-{ip}"
-            write_line(f, f'      <entry name="{name}"><ip-netmask>{ip}</ip-netmask></entry>')
-
-            addr_count += 1
-            if addr_count % args.flush_every == 0:
-                f.flush()
-
-        # Close shared address section
-        write_line(f, "    </address>")
-        write_line(f, "  </shared>")
-
-        # Device-group rulebase skeleton
-        write_line(f, "  <devices>")
-        write_line(f, '    <entry name="localhost.localdomain">')
-        write_line(f, "      <device-group>")
-        write_line(f, f'        <entry name="{args.dg}">')
-        write_line(f, "          <post-rulebase>")
-        write_line(f, "            <security>")
-        write_line(f, "              <rules>")
+        addr_count = write_addresses_until(
+            f, args.addr_prefix, ip_iter, addr_target_bytes,
+            f"Ran out of IPs in base network {args.base_network}. "
+            f"Use a larger network like 10.0.0.0/8.",
+            limit=args.max_addrs,
+        )
+
+        # Close shared address section, open device-group rulebase skeleton
+        f.write("    </address>\n"
+                "  </shared>\n"
+                "  <devices>\n"
+                '    <entry name="localhost.localdomain">\n'
+                "      <device-group>\n"
+                f'        <entry name="{args.dg}">\n'
+                "          <post-rulebase>\n"
+                "            <security>\n"
+                "              <rules>\n"
+                .encode())
 
         # Any/any allow rules until we hit target size
-        while current_size(out_path) < target_bytes:
-            rname = f"{args.rule_prefix}-{rule_count:07d}"
-            write_line(f, f'                <entry name="{rname}">')
-            write_line(f, "                  <from><member>any</member></from>")
-            write_line(f, "                  <to><member>any</member></to>")
-            write_line(f, "                  <source><member>any</member></source>")
-            write_line(f, "                  <destination><member>any</member></destination>")
-            write_line(f, "                  <application><member>any</member></application>")
-            write_line(f, "                  <service><member>any</member></service>")
-            write_line(f, "                  <action>allow</action>")
-            write_line(f, "                </entry>")
-
-            rule_count += 1
-            if rule_count % 1000 == 0:
-                f.flush()
+        rule_tmpl = RULE_TMPL % (args.rule_prefix.replace("%", "%%").encode() + b"-%07d")
+        rule_count = write_rules_until(f, rule_tmpl, target_bytes, first=0)
 
         # Close rulebase + XML
-        write_line(f, "              </rules>")
-        write_line(f, "            </security>")
-        write_line(f, "          </post-rulebase>")
-        write_line(f, "        </entry>")
-        write_line(f, "      </device-group>")
-        write_line(f, "    </entry>")
-        write_line(f, "  </devices>")
-        write_line(f, "</config>")
-        f.flush()
+        f.write(b"              </rules>\n"
+                b"            </security>\n"
+                b"          </post-rulebase>\n"
+                b"        </entry>\n"
+                b"      </device-group>\n"
+                b"    </entry>\n"
+                b"  </devices>\n"
+                b"</config>\n")
 
     elapsed = time.time() - t0
-    final_size = current_size(out_path)
+    final_size = os.path.getsize(out_path)
 
     print("Done.")
     print(f"File: {out_path}")
-    print(f"Size: {final_size / (1024*1024):.2f} MB (target {args.size_mb:.2f} MB)")
+    if args.compress == "none":
+        print(f"Size: {final_size / (1024*1024):.2f} MB (target {args.size_mb:.2f} MB)")
+    else:
+        print(f"Size: {f.n / (1024*1024):.2f} MB uncompressed (target {args.size_mb:.2f} MB), "
+              f"{final_size / (1024*1024):.2f} MB {args.compress}")
     print(f"Address objects: {addr_count}")
     print(f"Security rules: {rule_count}")
     print(f"Time: {elapsed:.2f}s")
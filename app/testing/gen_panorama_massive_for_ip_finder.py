@@ -16,16 +16,25 @@ Examples:
   python3 gen_panorama_massive_for_ip_finder.py --out big.xml --addr-count 200000 --rules 200000 --src-members 10 --dst-members 10
   python3 gen_panorama_massive_for_ip_finder.py --out big.xml --addr-count 500000 --rules 500000 --src-members 25 --dst-members 25 --base-network 10.0.0.0/8
   python3 gen_panorama_massive_for_ip_finder.py --out big.xml --addr-count 200000 --rules 100000 --src-members 50 --dst-members 50 --include-dg --dg dg-3 --dg-rules 50000
+  python3 gen_panorama_massive_for_ip_finder.py --out big.xml --addr-count 500000 --rules 500000 --jobs 8
 """
 
 from __future__ import annotations
 
 import argparse
+import contextlib
+import functools
 import ipaddress
+import itertools
+import multiprocessing
 import os
+import shutil
+import tempfile
 import time
 from typing import List
 
+from gen_output import COMPRESS_SUFFIX, compressor, host_ips
+
 
 TEMPLATE_PREFIX = """<?xml version="1.0"?>
 <config version="11.2.0" urldb="paloaltonetworks" detail-version="11.2.10">
@@ -105,10 +114,215 @@ TEMPLATE_SUFFIX = """</config>
 """
 
 
-def write_line(f, s: str) -> None:
-    f.write(s)
-    if not s.endswith("\n"):
-        f.write("\n")
+ADDRESS_ENTRY = b'      <entry name="%s"><ip-netmask>%s</ip-netmask></entry>\n'
+
+MEMBER_LINE = b"<member>%s</member>\n"
+
+# Whole rule entries, pre-encoded; filled in with (name, source members, destination members)
+# using a single bytes % per rule.
+SHARED_RULE = b"""          <entry name="%s">
+            <target><negate>no</negate></target>
+            <to><member>any</member></to>
+            <from><member>any</member></from>
+            <source>
+%s            </source>
+            <destination>
+%s            </destination>
+            <source-user><member>any</member></source-user>
+            <category><member>any</member></category>
+            <application><member>any</member></application>
+            <service><member>application-default</member></service>
+            <action>allow</action>
+            <log-start>no</log-start>
+            <log-end>yes</log-end>
+          </entry>
+"""
+
+DG_RULE = b"""                <entry name="%s">
+                  <target><negate>no</negate></target>
+                  <to><member>any</member></to>
+                  <from><member>any</member></from>
+                  <source>
+%s                  </source>
+                  <destination>
+%s                  </destination>
+                  <source-user><member>any</member></source-user>
+                  <category><member>any</member></category>
+                  <application><member>any</member></application>
+                  <service><member>application-default</member></service>
+                  <action>allow</action>
+                  <log-start>no</log-start>
+                  <log-end>yes</log-end>
+                </entry>
+"""
+
+# Entries are accumulated and written this many at a time.
+CHUNK_ENTRIES = 4096
+
+
+def write_chunks(f, chunks: List[bytes]) -> None:
+    f.write(b"".join(chunks))
+    chunks.clear()
+
+
+def member_block(members: List[bytes], start: int, count: int) -> bytes:
+    """Join count consecutive entries of members beginning at start, wrapping around the end."""
+    end = start + count
+    if end <= len(members):
+        return b"".join(members[start:end])
+
+    n = len(members)
+    full, rest = divmod(end - n, n)
+    return b"".join(members[start:] + members * full + members[:rest])
+
+
+@functools.lru_cache(maxsize=None)
+def object_names(addr_prefix: str, n_addrs: int) -> List[bytes]:
+    """
+    Encoded names of all address objects (test-addr_obj-00000051). Built once per process
+    and shared by the address objects and every <member> line that references them.
+    """
+    name_tmpl = (addr_prefix.replace("%", "%%") + "-%08d").encode()
+    return list(map(name_tmpl.__mod__, range(n_addrs)))
+
+
+def write_address_objects(f, args: argparse.Namespace, start: int, stop: int) -> None:
+    net = ipaddress.ip_network(args.base_network, strict=False)
+    ip_iter = host_ips(net, start)
+
+    # Numeric object names: no IP content in name
+    names = object_names(args.addr_prefix, args.addr_count)
+
+    # CHUNK_ENTRIES objects at a time, iterating and formatting in C via islice()/map()
+    for first in range(start, stop, CHUNK_ENTRIES):
+        last = min(first + CHUNK_ENTRIES, stop)
+        ips = list(itertools.islice(ip_iter, last - first))
+        # A short batch is written too: the objects made so far are kept, as before
+        f.write(b"".join(map(ADDRESS_ENTRY.__mod__, zip(names[first:last], map(str.encode, ips)))))
+        if len(ips) < last - first:
+            raise RuntimeError(
+                f"Ran out of IPs in {args.base_network} after {first + len(ips)} objects. "
+                f"Use a larger network (e.g. 10.0.0.0/8)."
+            )
+
+
+def write_rules(f, args: argparse.Namespace, section: str, start: int, stop: int) -> None:
+    n_addrs = args.addr_count
+    per_rule = args.src_members + args.dst_members
+
+    if section == "shared":
+        rule_tmpl = SHARED_RULE
+        indent = b" " * 14
+        name_prefix = args.shared_rule_prefix
+        first_member = start * per_rule
+    else:
+        rule_tmpl = DG_RULE
+        indent = b" " * 20
+        name_prefix = f"{args.dg_rule_prefix}-{args.dg}"
+        # DG rules carry on cycling through the objects where the shared rules stopped
+        first_member = (args.rules + start) * per_rule
+
+    # Every <member> line is one of n_addrs possibilities; build each once up front
+    members = list(map((indent + MEMBER_LINE).__mod__, object_names(args.addr_prefix, n_addrs)))
+
+    # Bake the name into the template so each rule is (number, source, destination)
+    rule_tmpl = rule_tmpl % (name_prefix.replace("%", "%%").encode() + b" %d", b"%s", b"%s")
+
+    emit_rules = rule_emitter(args.src_members, args.dst_members)
+    emit_rules(f, rule_tmpl, members, first_member % n_addrs, start, stop)
+
+
+# Source of the rule loop, specialised per run by rule_emitter(). With the member counts
+# as literals the common case (no wrap-around) is two constant-bound slices and one format.
+RULE_LOOP_SRC = """
+def emit_rules(f, rule_tmpl, members, cursor, start, stop):
+    n_addrs = len(members)
+    join = b"".join
+    chunks = []
+    append = chunks.append
+    for r in range(start + 1, stop + 1):
+        end = cursor + {per_rule}
+        if end <= n_addrs:
+            append(rule_tmpl % (r, join(members[cursor:cursor + {src_n}]), join(members[cursor + {src_n}:end])))
+            cursor = end if end < n_addrs else 0
+        else:
+            src = member_block(members, cursor, {src_n})
+            cursor = (cursor + {src_n}) % n_addrs
+            dst = member_block(members, cursor, {dst_n})
+            cursor = (cursor + {dst_n}) % n_addrs
+            append(rule_tmpl % (r, src, dst))
+        if len(chunks) >= CHUNK_ENTRIES:
+            write_chunks(f, chunks)
+    write_chunks(f, chunks)
+"""
+
+
+@functools.lru_cache(maxsize=None)
+def rule_emitter(src_n: int, dst_n: int):
+    """Compile emit_rules() for this run's fixed --src-members / --dst-members."""
+    src = RULE_LOOP_SRC.format(src_n=src_n, dst_n=dst_n, per_rule=src_n + dst_n)
+    namespace = {"member_block": member_block, "write_chunks": write_chunks, "CHUNK_ENTRIES": CHUNK_ENTRIES}
+    exec(compile(src, f"<emit_rules {src_n}x{dst_n}>", "exec"), namespace)
+    return namespace["emit_rules"]
+
+
+def write_section(f, args: argparse.Namespace, section: str, start: int, stop: int) -> None:
+    """Write entries start..stop-1 of section ("address", "shared" or "dg")."""
+    if section == "address":
+        write_address_objects(f, args, start, stop)
+    else:
+        write_rules(f, args, section, start, stop)
+
+
+def write_shard(shard: tuple) -> str:
+    """Worker entry point: write one (args, section, start, stop, path) slice to its own file."""
+    args, section, start, stop, path = shard
+    with open(path, "wb", buffering=1 << 20) as f:
+        write_section(f, args, section, start, stop)
+    return path
+
+
+def append_file(f, path: str, zero_copy: bool) -> None:
+    """
+    Append the contents of path to f. With zero_copy (f is the plain output file, not a
+    compressor) this goes through sendfile() where the OS allows it.
+    """
+    if zero_copy:
+        # sendfile() writes to the fd directly, behind whatever f still has buffered
+        f.flush()
+    with open(path, "rb") as src:
+        size = os.fstat(src.fileno()).st_size if zero_copy else 0
+        offset = 0
+        try:
+            while offset < size:
+                sent = os.sendfile(f.fileno(), src.fileno(), offset, size - offset)
+                if sent == 0:
+                    break
+                offset += sent
+        except (AttributeError, OSError):
+            # No sendfile(), or no file-to-file sendfile() (e.g. macOS)
+            pass
+        if offset < size or not zero_copy:
+            src.seek(offset)
+            shutil.copyfileobj(src, f)
+
+
+def emit_section(f, args: argparse.Namespace, section: str, count: int, pool, tmpdir: str) -> None:
+    """Write count entries of a section, split across the worker pool if there is one."""
+    if pool is None or count < 2:
+        write_section(f, args, section, 0, count)
+        return
+
+    step = -(-count // args.jobs)
+    shards = [
+        (args, section, start, min(start + step, count), os.path.join(tmpdir, f"{section}-{start}.part"))
+        for start in range(0, count, step)
+    ]
+    # imap() hands shards back in order: each is appended as soon as it and all earlier
+    # ones are done, and a failure is reported for the first shard that hit it.
+    for path in pool.imap(write_shard, shards):
+        append_file(f, path, zero_copy=args.compress == "none")
+        os.remove(path)
 
 
 def main() -> int:
@@ -125,7 +339,11 @@ def main() -> int:
     ap.add_argument("--dg", default="dg-test", help="Device-group name if --include-dg")
     ap.add_argument("--dg-rules", type=int, default=0, help="How many DG rules to generate (if include-dg)")
     ap.add_argument("--dg-rule-prefix", default="test rule dg", help="DG rule name prefix")
-    ap.add_argument("--flush-every", type=int, default=2000, help="Flush interval (entries)")
+    ap.add_argument("--flush-every", type=int, default=2000, help="Ignored; kept for compatibility")
+    ap.add_argument("--jobs", type=int, default=1,
+                    help="Worker processes used to generate the output in parallel (default 1)")
+    ap.add_argument("--compress", choices=sorted(COMPRESS_SUFFIX), default="none",
+                    help="Compress the output as it is written (.gz / .zst is appended to --out)")
     args = ap.parse_args()
 
     if args.src_members < 0 or args.dst_members < 0:
@@ -134,144 +352,59 @@ def main() -> int:
         raise SystemExit("--addr-count must be > 0")
     if args.rules < 0:
         raise SystemExit("--rules must be >= 0")
+    if args.jobs < 1:
+        raise SystemExit("--jobs must be >= 1")
 
-    if os.path.exists(args.out):
-        os.remove(args.out)
-
-    net = ipaddress.ip_network(args.base_network, strict=False)
-    ip_iter = net.hosts()
-
-    ips: List[str] = []
+    dg_rules = args.dg_rules if args.dg_rules > 0 else args.rules // 10
+    open_compressed = compressor(args.compress)
+    out_path = args.out + COMPRESS_SUFFIX[args.compress]
     t0 = time.time()
 
-    with open(args.out, "w", encoding="utf-8", newline="\n") as f:
+    with contextlib.ExitStack() as stack:
+        pool = tmpdir = None
+        if args.jobs > 1:
+            # Shards are written next to the output so they can be concatenated on the same
+            # filesystem. They are always plain XML; with --compress, compression happens as
+            # they are appended. The stack unwinds in reverse: the workers are stopped (even
+            # if one failed while others are still writing) before their shard dir is removed.
+            out_dir = os.path.dirname(os.path.abspath(out_path))
+            tmpdir = stack.enter_context(tempfile.TemporaryDirectory(dir=out_dir))
+            pool = stack.enter_context(multiprocessing.Pool(args.jobs))
+
+        f = raw = stack.enter_context(open(out_path, "wb", buffering=1 << 20))
+        if open_compressed is not None:
+            # Closed before raw, also on errors, so even a partial output is a complete stream
+            f = stack.enter_context(open_compressed(raw))
+
         # --- Write template prefix ---
-        f.write(TEMPLATE_PREFIX)
+        f.write(TEMPLATE_PREFIX.encode())
 
         # --- Generate address objects ---
-        for i in range(args.addr_count):
-            try:
-                ip = str(next(ip_iter))
-            except StopIteration:
-                raise RuntimeError(
-                    f"Ran out of IPs in {args.base_network} after {i} objects. "
-                    f"Use a larger network (e.g. 10.0.0.0/8)."
-                )
-
-            ips.append(ip)
-
-            # Numeric object names: no IP content in name
-            name = f"{args.addr_prefix}-{i:08d}"  # test-addr_obj-00000051
-            write_line(f, f'      <entry name="{name}"><ip-netmask>{ip}</ip-netmask></entry>')
-
-            if (i + 1) % args.flush_every == 0:
-                f.flush()
-
-        # --- Shared rules prefix ---
-        f.write(TEMPLATE_SHARED_RULES_PREFIX)
-
-        # --- Generate shared rules referencing objects heavily ---
-        n_addrs = args.addr_count
-        if n_addrs <= 0:
-            raise RuntimeError("No address objects generated (unexpected).")
-
-        cursor = 0
-        for r in range(args.rules):
-            rname = f"{args.shared_rule_prefix} {r + 1}"
-            write_line(f, f'          <entry name="{rname}">')
-            write_line(f, "            <target><negate>no</negate></target>")
-            write_line(f, "            <to><member>any</member></to>")
-            write_line(f, "            <from><member>any</member></from>")
-
-            # Source members
-            write_line(f, "            <source>")
-            for _ in range(args.src_members):
-                idx = cursor % n_addrs
-                cursor += 1
-                member_name = f"{args.addr_prefix}-{idx:08d}"
-                write_line(f, f"              <member>{member_name}</member>")
-            write_line(f, "            </source>")
-
-            # Destination members
-            write_line(f, "            <destination>")
-            for _ in range(args.dst_members):
-                idx = cursor % n_addrs
-                cursor += 1
-                member_name = f"{args.addr_prefix}-{idx:08d}"
-                write_line(f, f"              <member>{member_name}</member>")
-            write_line(f, "            </destination>")
-
-            write_line(f, "            <source-user><member>any</member></source-user>")
-            write_line(f, "            <category><member>any</member></category>")
-            write_line(f, "            <application><member>any</member></application>")
-            write_line(f, "            <service><member>application-default</member></service>")
-            write_line(f, "            <action>allow</action>")
-            write_line(f, "            <log-start>no</log-start>")
-            write_line(f, "            <log-end>yes</log-end>")
-            write_line(f, "          </entry>")
-
-            if (r + 1) % 500 == 0:
-                f.flush()
-
-        # Close shared rules + shared section
-        f.write(TEMPLATE_SHARED_RULES_SUFFIX_AND_SHARED_CLOSE)
+        emit_section(f, args, "address", args.addr_count, pool, tmpdir)
+
+        # --- Shared rules referencing objects heavily ---
+        f.write(TEMPLATE_SHARED_RULES_PREFIX.encode())
+        emit_section(f, args, "shared", args.rules, pool, tmpdir)
+        f.write(TEMPLATE_SHARED_RULES_SUFFIX_AND_SHARED_CLOSE.encode())
 
         # --- Optional device-group rules ---
         if args.include_dg:
-            dg_rules = args.dg_rules if args.dg_rules > 0 else args.rules // 10
-            f.write(TEMPLATE_DEVICES_PREFIX.format(DG_NAME=args.dg))
-
-            for r in range(dg_rules):
-                rname = f"{args.dg_rule_prefix}-{args.dg} {r + 1}"
-                write_line(f, f'                <entry name="{rname}">')
-                write_line(f, "                  <target><negate>no</negate></target>")
-                write_line(f, "                  <to><member>any</member></to>")
-                write_line(f, "                  <from><member>any</member></from>")
-
-                write_line(f, "                  <source>")
-                for _ in range(args.src_members):
-                    idx = cursor % n_addrs
-                    cursor += 1
-                    member_name = f"{args.addr_prefix}-{idx:08d}"
-                    write_line(f, f"                    <member>{member_name}</member>")
-                write_line(f, "                  </source>")
-
-                write_line(f, "                  <destination>")
-                for _ in range(args.dst_members):
-                    idx = cursor % n_addrs
-                    cursor += 1
-                    member_name = f"{args.addr_prefix}-{idx:08d}"
-                    write_line(f, f"                    <member>{member_name}</member>")
-                write_line(f, "                  </destination>")
-
-                write_line(f, "                  <source-user><member>any</member></source-user>")
-                write_line(f, "                  <category><member>any</member></category>")
-                write_line(f, "                  <application><member>any</member></application>")
-                write_line(f, "                  <service><member>application-default</member></service>")
-                write_line(f, "                  <action>allow</action>")
-                write_line(f, "                  <log-start>no</log-start>")
-                write_line(f, "                  <log-end>yes</log-end>")
-                write_line(f, "                </entry>")
-
-                if (r + 1) % 500 == 0:
-                    f.flush()
-
-            f.write(TEMPLATE_DEVICES_SUFFIX)
+            f.write(TEMPLATE_DEVICES_PREFIX.format(DG_NAME=args.dg).encode())
+            emit_section(f, args, "dg", dg_rules, pool, tmpdir)
+            f.write(TEMPLATE_DEVICES_SUFFIX.encode())
 
         # Close config
-        f.write(TEMPLATE_SUFFIX)
-        f.flush()
+        f.write(TEMPLATE_SUFFIX.encode())
 
     elapsed = time.time() - t0
-    final_mb = os.path.getsize(args.out) / (1024 * 1024)
+    final_mb = os.path.getsize(out_path) / (1024 * 1024)
 
     print("Done.")
-    print(f"File: {args.out}")
-    print(f"Size: {final_mb:.2f} MB")
+    print(f"File: {out_path}")
+    print(f"Size: {final_mb:.2f} MB" + (f" ({args.compress})" if open_compressed else ""))
     print(f"Address objects: {args.addr_count}")
     print(f"Shared rules: {args.rules} (src {args.src_members}, dst {args.dst_members})")
     if args.include_dg:
-        dg_rules = args.dg_rules if args.dg_rules > 0 else args.rules // 10
         print(f"DG rules: {dg_rules} (src {args.src_members}, dst {args.dst_members})")
     print(f"Time: {elapsed:.2f}s")
 
@@ -24,6 +24,8 @@ import ipaddress
 import os
 import time
 
+from gen_output import COMPRESS_SUFFIX, host_ips, open_output, write_addresses_until, write_rules_until
+
 
 TEMPLATE_PREFIX = """<?xml version="1.0"?>
 <config version="11.2.0" urldb="paloaltonetworks" detail-version="11.2.10">
@@ -106,19 +108,43 @@ TEMPLATE_SUFFIX = """</config>
 """
 
 
-def write_line(f, s: str) -> None:
-    f.write(s)
-    if not s.endswith("\n"):
-        f.write("\n")
-
+# Any/any allow rules, pre-encoded; only the entry name varies.
+SHARED_RULE = b"""          <entry name="%s">
+            <target><negate>no</negate></target>
+            <to><member>any</member></to>
+            <from><member>any</member></from>
+            <source><member>any</member></source>
+            <destination><member>any</member></destination>
+            <source-user><member>any</member></source-user>
+            <category><member>any</member></category>
+            <application><member>any</member></application>
+            <service><member>application-default</member></service>
+            <action>allow</action>
+            <log-start>no</log-start>
+            <log-end>yes</log-end>
+          </entry>
+"""
 
-def fsize(path: str) -> int:
-    return os.path.getsize(path) if os.path.exists(path) else 0
+DG_RULE = b"""                <entry name="%s">
+                  <target><negate>no</negate></target>
+                  <to><member>any</member></to>
+                  <from><member>any</member></from>
+                  <source><member>any</member></source>
+                  <destination><member>any</member></destination>
+                  <source-user><member>any</member></source-user>
+                  <category><member>any</member></category>
+                  <application><member>any</member></application>
+                  <service><member>application-default</member></service>
+                  <action>allow</action>
+                  <log-start>no</log-start>
+                  <log-end>yes</log-end>
+                </entry>
+"""
 
 
-def safe_rule_name(prefix: str, n: int) -> str:
-    # Panorama rule names can include spaces; keep it boring.
-    return f"{prefix} {n}"
+def rule_name_pattern(prefix: str) -> bytes:
+    # Panorama rule names can include spaces; keep it boring. "%d" takes the rule number.
+    return prefix.replace("%", "%%").encode() + b" %d"
 
 
 def main() -> int:
@@ -133,115 +159,71 @@ def main() -> int:
     ap.add_argument("--dg-rule-prefix", default="test rule dg", help="Device-group rule name prefix")
     ap.add_argument("--addr-fill-percent", type=float, default=70.0,
                     help="Percent of size used for address objects before rules (default 70)")
-    ap.add_argument("--flush-every", type=int, default=2000, help="Flush interval")
+    ap.add_argument("--flush-every", type=int, default=2000, help="Ignored; kept for compatibility")
+    ap.add_argument("--compress", choices=sorted(COMPRESS_SUFFIX), default="none",
+                    help="Compress the output as it is written (.gz / .zst is appended to --out); "
+                         "--size-mb still counts uncompressed bytes")
     args = ap.parse_args()
 
     target_bytes = int(args.size_mb * 1024 * 1024)
     addr_target_bytes = int(target_bytes * (args.addr_fill_percent / 100.0))
 
-    if os.path.exists(args.out):
-        os.remove(args.out)
+    out_path = args.out + COMPRESS_SUFFIX[args.compress]
 
     net = ipaddress.ip_network(args.base_network, strict=False)
-    ip_iter = net.hosts()
+    ip_iter = host_ips(net)
 
-    addr_count = 0
-    shared_rule_count = 0
     dg_rule_count = 0
 
     t0 = time.time()
 
-    with open(args.out, "w", encoding="utf-8", newline="\n") as f:
+    with open_output(out_path, args.compress) as f:
         # --- Write template prefix up to <shared><address> ---
-        f.write(TEMPLATE_PREFIX)
+        f.write(TEMPLATE_PREFIX.encode())
 
         # --- Inject address objects until addr_target_bytes ---
-        while fsize(args.out) < addr_target_bytes:
-            try:
-                ip = str(next(ip_iter))
-            except StopIteration:
-                raise RuntimeError(
-                    f"Ran out of IPs in {args.base_network}. Use a larger network (e.g. 10.0.0.0/8)."
-                )
-
-            # Name includes IP exactly as requested: test-addr_obj-10.1.1.1
-            name = f"{args.addr_prefix}-{ip}"
-            write_line(f, f'      <entry name="{name}"><ip-netmask>{ip}</ip-netmask></entry>')
-
-            addr_count += 1
-            if addr_count % args.flush_every == 0:
-                f.flush()
+        # Name includes IP exactly as requested: test-addr_obj-10.1.1.1
+        addr_count = write_addresses_until(
+            f, args.addr_prefix, ip_iter, addr_target_bytes,
+            f"Ran out of IPs in {args.base_network}. Use a larger network (e.g. 10.0.0.0/8).",
+        )
 
         # --- Continue template into shared pre-rulebase rules ---
-        f.write(TEMPLATE_MID)
+        f.write(TEMPLATE_MID.encode())
 
         # --- Inject shared rules until we hit overall target (or until DG section needs room) ---
         # If include-dg, leave a little room for the device-group section.
-        reserve_for_devices = 0.5 * 1024 * 1024 if args.include_dg else 0  # ~0.5MB reserved
-        while fsize(args.out) < (target_bytes - reserve_for_devices):
-            shared_rule_count += 1
-            rname = safe_rule_name(args.shared_rule_prefix, shared_rule_count)
-
-            write_line(f, f'          <entry name="{rname}">')
-            write_line(f, "            <target><negate>no</negate></target>")
-            write_line(f, "            <to><member>any</member></to>")
-            write_line(f, "            <from><member>any</member></from>")
-            write_line(f, "            <source><member>any</member></source>")
-            write_line(f, "            <destination><member>any</member></destination>")
-            write_line(f, "            <source-user><member>any</member></source-user>")
-            write_line(f, "            <category><member>any</member></category>")
-            write_line(f, "            <application><member>any</member></application>")
-            write_line(f, "            <service><member>application-default</member></service>")
-            write_line(f, "            <action>allow</action>")
-            write_line(f, "            <log-start>no</log-start>")
-            write_line(f, "            <log-end>yes</log-end>")
-            write_line(f, "          </entry>")
-
-            if shared_rule_count % 1000 == 0:
-                f.flush()
+        reserve_for_devices = 512 * 1024 if args.include_dg else 0  # ~0.5MB reserved
+        shared_target_bytes = target_bytes - reserve_for_devices
+        shared_rule_tmpl = SHARED_RULE % rule_name_pattern(args.shared_rule_prefix)
+        shared_rule_count = write_rules_until(f, shared_rule_tmpl, shared_target_bytes)
 
         # --- Close shared rules and shared section ---
-        f.write(TEMPLATE_AFTER_SHARED_RULES)
+        f.write(TEMPLATE_AFTER_SHARED_RULES.encode())
 
         # --- Optional: include a device-group section (still template-driven) ---
         if args.include_dg:
-            f.write(TEMPLATE_DEVICES_PREFIX.format(DG_NAME=args.dg))
+            f.write(TEMPLATE_DEVICES_PREFIX.format(DG_NAME=args.dg).encode())
 
             # Add DG rules (any/any allow). Keep generating until we hit target.
-            while fsize(args.out) < target_bytes:
-                dg_rule_count += 1
-                rname = safe_rule_name(f"{args.dg_rule_prefix}-{args.dg}", dg_rule_count)
-
-                write_line(f, f'                <entry name="{rname}">')
-                write_line(f, "                  <target><negate>no</negate></target>")
-                write_line(f, "                  <to><member>any</member></to>")
-                write_line(f, "                  <from><member>any</member></from>")
-                write_line(f, "                  <source><member>any</member></source>")
-                write_line(f, "                  <destination><member>any</member></destination>")
-                write_line(f, "                  <source-user><member>any</member></source-user>")
-                write_line(f, "                  <category><member>any</member></category>")
-                write_line(f, "                  <application><member>any</member></application>")
-                write_line(f, "                  <service><member>application-default</member></service>")
-                write_line(f, "                  <action>allow</action>")
-                write_line(f, "                  <log-start>no</log-start>")
-                write_line(f, "                  <log-end>yes</log-end>")
-                write_line(f, "                </entry>")
-
-                if dg_rule_count % 1000 == 0:
-                    f.flush()
-
-            f.write(TEMPLATE_DEVICES_SUFFIX)
+            dg_rule_tmpl = DG_RULE % rule_name_pattern(f"{args.dg_rule_prefix}-{args.dg}")
+            dg_rule_count = write_rules_until(f, dg_rule_tmpl, target_bytes)
+
+            f.write(TEMPLATE_DEVICES_SUFFIX.encode())
 
         # --- Close config ---
-        f.write(TEMPLATE_SUFFIX)
-        f.flush()
+        f.write(TEMPLATE_SUFFIX.encode())
 
     elapsed = time.time() - t0
-    final_bytes = fsize(args.out)
+    final_bytes = os.path.getsize(out_path)
 
     print("Done.")
-    print(f"File: {args.out}")
-    print(f"Size: {final_bytes / (1024 * 1024):.2f} MB (target {args.size_mb:.2f} MB)")
+    print(f"File: {out_path}")
+    if args.compress == "none":
+        print(f"Size: {final_bytes / (1024 * 1024):.2f} MB (target {args.size_mb:.2f} MB)")
+    else:
+        print(f"Size: {f.n / (1024 * 1024):.2f} MB uncompressed (target {args.size_mb:.2f} MB), "
+              f"{final_bytes / (1024 * 1024):.2f} MB {args.compress}")
     print(f"Address objects: {addr_count}")
     print(f"Shared pre-rule rules: {shared_rule_count}")
     if args.include_dg: